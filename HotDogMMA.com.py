@@ -1,11 +1,19 @@
 import os
 import feedparser
+import gzip
+import requests
 import sqlite3
-from flask import Flask, render_template_string
-from datetime import datetime
+from io import BytesIO
+from lxml import etree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, g, request
+from werkzeug.http import http_date
+from datetime import datetime, timezone
 from dateutil import parser
 from apscheduler.schedulers.background import BackgroundScheduler
 import logging
+import threading
+import time
 
 # Environment Configuration
 DEBUG_MODE = os.getenv('DEBUG_MODE', 'False').lower() == 'true'
@@ -37,11 +45,69 @@ NEWS_SOURCES = {
 
 DB_FILE = 'news.db'
 ARTICLE_LIMIT = 50
+FETCH_TIMEOUT = 10
+MAX_FETCH_WORKERS = 16
+FEED_INTERVAL_MINUTES = 90
+FEED_JITTER_SECONDS = 120
+MAX_SKIPPED_RUNS = 8
+
+# One parameterized statement for both categories so SQLite reuses the prepared plan
+SQL_LATEST_ARTICLES = '''
+    SELECT title, link, display_date FROM articles
+    WHERE category = ?
+    ORDER BY published_date DESC
+    LIMIT ?
+'''
+
+# Rendered home page, rebuilt after each aggregation cycle
+_PAGE_CACHE = {'html': None, 'gzip': None, 'ts': 0}
+PAGE_MAX_AGE = 300
+_PAGE_LOCK = threading.Lock()
+
+# Conditional GET validators per feed URL: (etag, last_modified)
+_FEED_META = {}
+
+# Backoff state per failing feed URL: (consecutive failures, scheduled runs left to skip)
+_FEED_FAILURES = {}
+
+# Single long-lived writer connection shared by init and the scheduler thread;
+# readers get their own connection per app context (see get_db)
+_WRITER_CONN = None
+_WRITER_LOCK = threading.Lock()
+
+# Dates
+def parse_date(value):
+    try:
+        return parser.parse(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def utc_iso(dt):
+    # published_date is stored as UTC ISO so that text order is chronological order
+    return dt.astimezone(timezone.utc).isoformat()
 
 # Database setup
+def connect_db():
+    # Autocommit mode: writers open their transactions explicitly with BEGIN
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None)
+    # Per-connection settings; journal_mode=WAL is persistent and set in init_db
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-20000')
+    return conn
+
+def get_writer_conn():
+    # Callers must hold _WRITER_LOCK
+    global _WRITER_CONN
+    if _WRITER_CONN is None:
+        _WRITER_CONN = connect_db()
+    return _WRITER_CONN
+
 def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
+    with _WRITER_LOCK, get_writer_conn() as conn:
         c = conn.cursor()
+        c.execute('PRAGMA journal_mode=WAL')
+        c.execute('BEGIN')
         c.execute('''
             CREATE TABLE IF NOT EXISTS articles (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -49,122 +115,281 @@ def init_db():
                 title TEXT,
                 link TEXT UNIQUE,
                 published_date TEXT,
-                scraped_date TEXT
+                scraped_date TEXT,
+                display_date TEXT
+            )
+        ''')
+        # Older databases predate display_date; add it and backfill below
+        columns = [row[1] for row in c.execute('PRAGMA table_info(articles)')]
+        if 'display_date' not in columns:
+            c.execute('ALTER TABLE articles ADD COLUMN display_date TEXT')
+        # Older rows hold RFC 822 or mixed-offset dates. Rewrite published_date as UTC ISO
+        # so idx_cat_date orders them correctly, and fill display_date from the publisher's
+        # own date in the same pass. Unparseable dates become NULL (sorting last) with an
+        # empty display_date.
+        rows = c.execute('''
+            SELECT id, published_date FROM articles
+            WHERE display_date IS NULL
+               OR (published_date IS NOT NULL AND published_date NOT LIKE '%+00:00')
+        ''').fetchall()
+        updates = []
+        for id_, published_date in rows:
+            published = parse_date(published_date)
+            if published is None:
+                updates.append((None, '', id_))
+            else:
+                updates.append((utc_iso(published), published.strftime('%m-%d-%Y'), id_))
+        c.executemany('UPDATE articles SET published_date = ?, display_date = ? WHERE id = ?', updates)
+        # Older databases were created without UNIQUE(link); drop their duplicates and
+        # add a unique index so the page query needs no DISTINCT
+        unique_columns = [
+            [info[2] for info in c.execute(f'PRAGMA index_info("{name}")').fetchall()]
+            for _, name, unique, *_ in c.execute('PRAGMA index_list(articles)').fetchall()
+            if unique
+        ]
+        if ['link'] not in unique_columns:
+            c.execute('DELETE FROM articles WHERE id NOT IN (SELECT MIN(id) FROM articles GROUP BY link)')
+            c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_link ON articles (link);')
+        # Composite index serves the per-category "newest first" query without a sort
+        c.execute('CREATE INDEX IF NOT EXISTS idx_cat_date ON articles (category, published_date DESC);')
+        c.execute('DROP INDEX IF EXISTS idx_category;')
+        c.execute('DROP INDEX IF EXISTS idx_published_date;')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS feed_meta (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT
             )
         ''')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_category ON articles (category);')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_published_date ON articles (published_date);')
         conn.commit()
+        for url, etag, last_modified in c.execute('SELECT url, etag, last_modified FROM feed_meta'):
+            _FEED_META[url] = (etag, last_modified)
     logging.info("✅ Database initialized.")
 
+# Feed Parsing
+def parse_feed_fast(xml_bytes):
+    """Yield title/link/published for each RSS <item> or Atom <entry>."""
+    for _, elem in etree.iterparse(BytesIO(xml_bytes), events=('end',),
+                                   tag=('{*}item', '{*}entry'), resolve_entities=False):
+        yield {
+            "title": _entry_title(elem),
+            "link": _entry_link(elem),
+            "published": (elem.findtext('{*}pubDate') or elem.findtext('{*}published')
+                          or elem.findtext('{*}updated') or elem.findtext('{*}date')),
+        }
+        elem.clear()
+
+def _entry_title(elem):
+    title = elem.find('{*}title')
+    # itertext also covers Atom type="xhtml" titles, which are wrapped in a <div>
+    return ''.join(title.itertext()).strip() if title is not None else ''
+
+def _entry_link(elem):
+    for link in elem.iterfind('{*}link'):
+        href = link.get('href')
+        # RSS puts the URL in the text, Atom in the href of the alternate link
+        if href is None:
+            if link.text and link.text.strip():
+                return link.text.strip()
+        elif link.get('rel', 'alternate') == 'alternate':
+            return href
+    # Some RSS items only carry their URL as a permalink guid
+    guid = elem.find('{*}guid')
+    if guid is not None and guid.get('isPermaLink', 'true') == 'true' and guid.text:
+        return guid.text.strip()
+    return ''
+
+def parse_feed_slow(xml_bytes, headers):
+    """Fallback for feeds lxml rejects or finds no entries in; feedparser is more forgiving."""
+    # Only title/link/date are used and the page escapes them on render,
+    # so skip feedparser's HTML sanitizing and URI resolving
+    feed = feedparser.parse(
+        xml_bytes,
+        response_headers=headers,
+        sanitize_html=False,
+        resolve_relative_uris=False,
+    )
+    entries = []
+    for entry in feed.entries:
+        # Handle Atom link structures
+        link = entry.get('link', '')
+        if isinstance(link, dict):
+            link = link.get('href', '')
+        entries.append({
+            "title": entry.get('title', ''),
+            "link": link,
+            "published": entry.get('published') or entry.get('updated'),
+        })
+    return entries
+
 # News Fetching (updated)
 def fetch_news_rss(feed_url, category):
     try:
-        feed = feedparser.parse(feed_url)
+        etag, last_modified = _FEED_META.get(feed_url, (None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        # Download with a timeout so one slow feed can't stall a worker
+        response = requests.get(feed_url, headers=headers, timeout=FETCH_TIMEOUT)
+        if response.status_code == 304:
+            logging.info(f"Not modified: {feed_url}")
+            _FEED_FAILURES.pop(feed_url, None)
+            return [], None
+        response.raise_for_status()
+        try:
+            entries = list(parse_feed_fast(response.content))
+        except etree.XMLSyntaxError as e:
+            logging.warning(f"lxml could not parse {feed_url}: {e}")
+            entries = []
+        if not entries:
+            logging.warning(f"Falling back to feedparser for {feed_url}")
+            entries = parse_feed_slow(response.content, response.headers)
+        if not entries:
+            raise ValueError("no feed entries found")
         articles = []
         seen_links = set()
+        # Fallback for entries without a usable date; one clock read per feed
+        now = datetime.now()
 
-        for entry in feed.entries:
-            # Handle Atom link structures
-            if isinstance(entry.link, dict):
-                link = entry.link.get('href', '')
-            else:
-                link = entry.link
-
+        for entry in entries:
+            link = entry['link']
             if not link or link in seen_links:
                 continue
 
-            published_date = entry.get('published') or entry.get('updated')
-            if published_date:
-                try:
-                    published_date = parser.parse(published_date).isoformat()
-                except Exception:
-                    published_date = datetime.now().isoformat()
-            else:
-                published_date = datetime.now().isoformat()
+            published = parse_date(entry['published']) or now
 
             articles.append({
                 "category": category,
-                "title": entry.title,
+                "title": entry['title'],
                 "link": link,
-                "published_date": published_date
+                "published_date": utc_iso(published),
+                # Formatted once here, in the publisher's timezone, so the page never parses dates
+                "display_date": published.strftime('%m-%d-%Y')
             })
 
             seen_links.add(link)
 
         articles.sort(key=lambda x: x['published_date'], reverse=True)
-        return articles
+        _FEED_FAILURES.pop(feed_url, None)
+        # Validators go back to the caller, which records them once the articles are saved
+        return articles, (response.headers.get('ETag'), response.headers.get('Last-Modified'))
 
     except Exception as e:
         logging.error(f"Failed to fetch {feed_url}: {e}")
-        return []
+        # Exponential backoff: skip 0, 1, 3, 7... scheduled runs after each failure
+        failures = _FEED_FAILURES.get(feed_url, (0, 0))[0] + 1
+        _FEED_FAILURES[feed_url] = (failures, min(2 ** (failures - 1) - 1, MAX_SKIPPED_RUNS))
+        return [], None
 
 def save_articles_to_db(articles):
-    with sqlite3.connect(DB_FILE) as conn:
+    scraped_date = datetime.now().isoformat()
+    rows = [
+        (article['category'], article['title'], article['link'], article['published_date'],
+         scraped_date, article['display_date'])
+        for article in articles
+    ]
+    with _WRITER_LOCK, get_writer_conn() as conn:
         c = conn.cursor()
-        for article in articles:
-            try:
-                c.execute('''
-                    INSERT OR IGNORE INTO articles (category, title, link, published_date, scraped_date)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    article['category'],
-                    article['title'],
-                    article['link'],
-                    article['published_date'],
-                    datetime.now().isoformat()
-                ))
-            except sqlite3.IntegrityError:
-                logging.info(f"Skipping duplicate: {article['link']}")
+        # One explicit transaction for the whole batch; INSERT OR IGNORE skips duplicates
+        c.execute('BEGIN')
+        c.executemany('''
+            INSERT OR IGNORE INTO articles (category, title, link, published_date, scraped_date, display_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        inserted = c.rowcount
         conn.commit()
     logging.info("✅ Articles saved to DB.")
+    return inserted
+
+def save_feed_meta(feed_url, etag, last_modified):
+    # Callers save a feed's validators only after its articles are committed
+    with _WRITER_LOCK, get_writer_conn() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO feed_meta (url, etag, last_modified)
+            VALUES (?, ?, ?)
+        ''', (feed_url, etag, last_modified))
+    _FEED_META[feed_url] = (etag, last_modified)
 
 def aggregate_news():
     all_articles = []
-    processed_links = set()
-    for category, sources in NEWS_SOURCES.items():
-        for source in sources:
-            articles = fetch_news_rss(source, category)
-            for article in articles:
-                if article['link'] not in processed_links:
-                    all_articles.append(article)
-                    processed_links.add(article['link'])
+    validators = {}
+    jobs = [(category, source) for category, sources in NEWS_SOURCES.items() for source in sources]
+    # Feeds are network-bound, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(jobs))) as executor:
+        futures = {executor.submit(fetch_news_rss, source, category): source for category, source in jobs}
+        for future in as_completed(futures):
+            articles, feed_validators = future.result()
+            all_articles.extend(articles)
+            if feed_validators:
+                validators[futures[future]] = feed_validators
+    # Duplicate links across feeds are dropped by INSERT OR IGNORE on the unique link
     save_articles_to_db(all_articles)
+    # Record validators only after the articles they cover are committed
+    for feed_url, (etag, last_modified) in validators.items():
+        save_feed_meta(feed_url, etag, last_modified)
+    refresh_page_cache()
     logging.info("🔄 Aggregation complete.")
 
+def fetch_and_save_one(feed_url, category):
+    failures, skip = _FEED_FAILURES.get(feed_url, (0, 0))
+    if skip:
+        _FEED_FAILURES[feed_url] = (failures, skip - 1)
+        logging.info(f"Backing off {feed_url} after {failures} failures ({skip} runs left)")
+        return
+    articles, validators = fetch_news_rss(feed_url, category)
+    if validators is None:
+        return
+    inserted = save_articles_to_db(articles)
+    save_feed_meta(feed_url, *validators)
+    # Only re-render when this feed actually added something new
+    if inserted:
+        refresh_page_cache()
+
+def schedule_feed_jobs(scheduler):
+    # One job per feed so a slow or failing feed never delays the others
+    for category, sources in NEWS_SOURCES.items():
+        for source in sources:
+            scheduler.add_job(
+                fetch_and_save_one, 'interval',
+                args=[source, category],
+                minutes=FEED_INTERVAL_MINUTES,
+                jitter=FEED_JITTER_SECONDS,
+                id=f'feed:{source}',
+                max_instances=1,
+                coalesce=True,
+            )
+
+def refresh_page_cache():
+    # Per-feed jobs refresh concurrently; serialise read, render and store so an
+    # older render can never overwrite a newer one
+    with _PAGE_LOCK:
+        with app.app_context():
+            html = home_render()
+        # Compress once per cycle; swap all fields in one update so readers never see a mix
+        _PAGE_CACHE.update({
+            'html': html,
+            'gzip': gzip.compress(html.encode('utf-8'), compresslevel=6),
+            'ts': time.time(),
+        })
+
 # Flask App
 app = Flask(__name__)
 
-@app.route('/')
-def home():
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
+def get_db():
+    if 'db' not in g:
+        g.db = connect_db()
+    return g.db
 
-        c.execute(f'''
-            SELECT DISTINCT title, link, published_date FROM articles
-            WHERE category = "MMA"
-            ORDER BY datetime(published_date) DESC
-            LIMIT {ARTICLE_LIMIT}
-        ''')
-        mma_rows = c.fetchall()
-        mma_articles = [
-            (title, link, f"Published on: {datetime.fromisoformat(published_date).strftime('%m-%d-%Y')}")
-            for (title, link, published_date) in mma_rows
-        ]
-
-        c.execute(f'''
-            SELECT DISTINCT title, link, published_date FROM articles
-            WHERE category = "Boxing"
-            ORDER BY datetime(published_date) DESC
-            LIMIT {ARTICLE_LIMIT}
-        ''')
-        boxing_rows = c.fetchall()
-        boxing_articles = [
-            (title, link, f"Published on: {datetime.fromisoformat(published_date).strftime('%m-%d-%Y')}")
-            for (title, link, published_date) in boxing_rows
-        ]
+@app.teardown_appcontext
+def close_db(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
 
-    return render_template_string('''
+# Compiled once at import instead of on every render
+_HOME_TPL = app.jinja_env.from_string('''
     <!DOCTYPE html>
     <html>
     <head>
@@ -193,29 +418,56 @@ def home():
             <div class="news-section">
                 <h2>MMA News</h2>
                 <ul>
-                {% for title, link, published_date in mma_articles %}
-                    <li><a href="{{ link }}">{{ title }}</a> <span>({{ published_date }})</span></li>
+                {% for title, link, display_date in mma_articles %}
+                    <li><a href="{{ link }}">{{ title }}</a> <span>(Published on: {{ display_date }})</span></li>
                 {% endfor %}
                 </ul>
             </div>
             <div class="news-section">
                 <h2>Boxing News</h2>
                 <ul>
-                {% for title, link, published_date in boxing_articles %}
-                    <li><a href="{{ link }}">{{ title }}</a> <span>({{ published_date }})</span></li>
+                {% for title, link, display_date in boxing_articles %}
+                    <li><a href="{{ link }}">{{ title }}</a> <span>(Published on: {{ display_date }})</span></li>
                 {% endfor %}
                 </ul>
             </div>
         </div>
     </body>
     </html>
-    ''', mma_articles=mma_articles, boxing_articles=boxing_articles)
+    ''')
+
+@app.route('/')
+def home():
+    if _PAGE_CACHE['html'] is None:
+        refresh_page_cache()
+    # Snapshot so body and Last-Modified come from the same render
+    page = _PAGE_CACHE.copy()
+    headers = {
+        'Cache-Control': f'max-age={PAGE_MAX_AGE}',
+        'Vary': 'Accept-Encoding',
+        'Last-Modified': http_date(page['ts']),
+    }
+    if request.accept_encodings['gzip']:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(page['gzip'], mimetype='text/html', headers=headers)
+    return Response(page['html'], mimetype='text/html', headers=headers)
+
+def home_render():
+    c = get_db().cursor()
+
+    c.execute(SQL_LATEST_ARTICLES, ('MMA', ARTICLE_LIMIT))
+    mma_articles = c.fetchall()
+
+    c.execute(SQL_LATEST_ARTICLES, ('Boxing', ARTICLE_LIMIT))
+    boxing_articles = c.fetchall()
+
+    return _HOME_TPL.render(mma_articles=mma_articles, boxing_articles=boxing_articles)
 
 # Run App
 if __name__ == '__main__':
     init_db()
     aggregate_news()
     scheduler = BackgroundScheduler()
-    scheduler.add_job(aggregate_news, 'interval', minutes=90)
+    schedule_feed_jobs(scheduler)
     scheduler.start()
     app.run(host='0.0.0.0', port=8000, debug=False)